@@ -1,41 +1,130 @@
 import json
+import mmap
 import os
 import sys
 import glob
 import pprint
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from tqdm import tqdm
 import re
 
-# Set to True to enable detailed structure debugging
-DEBUG_MODE = True
+# orjson parses large exports several times faster than the stdlib json
+# module; fall back silently when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ijson lets us stream huge exports one conversation at a time instead of
+# holding the whole list in memory; prefer the C-backed yajl2 parser
+try:
+    import ijson.backends.yajl2_c as ijson
+except ImportError:
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+
+# NumPy sorts message timestamps in C; fall back to list.sort without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ChatGPT exports use strict ISO-8601 date strings, so dateutil's
+# isoparse beats the heuristic parser.parse by a wide margin; on
+# Python 3.11+ datetime.fromisoformat covers the same strings when
+# dateutil is missing
+try:
+    from dateutil.parser import isoparse as _isoparse
+except ImportError:
+    _isoparse = datetime.fromisoformat
+
+# Filename sanitization patterns, compiled once at import so the per-title
+# work runs entirely in the C regex engine
+_SANITIZE_RE = re.compile(r'[^\w \-]+')
+_SPACE_RE = re.compile(r' +')
+
+# ASCII fast path for the sanitizer: str.translate with a delete table
+# is a single C-level pass over the string buffer, cheaper still than
+# the regex; non-ASCII titles keep using _SANITIZE_RE
+_SANITIZE_TABLE = {cp: None for cp in range(0x80)
+                   if not chr(cp).isalnum() and chr(cp) not in " _-"}
+
+# Debugging is opt-in via the environment so normal runs keep the hot
+# loop free of per-entry stdout traffic: CHATGPT_DEBUG=1 enables the
+# structure dumps (and implies date diagnostics), CHATGPT_DEBUG_DATES=1
+# enables just the date-filter diagnostics
+DEBUG_MODE = os.environ.get('CHATGPT_DEBUG') == '1'
 # Number of entries to print detailed structure for when debugging
 DEBUG_ENTRIES = 1
-# Enable to print details about dates for debugging date filtering
-DEBUG_DATES = True
+DEBUG_DATES = DEBUG_MODE or os.environ.get('CHATGPT_DEBUG_DATES') == '1'
+
+def _iter_json_items(file_path):
+    """Stream top-level list entries from a JSON file one at a time."""
+    try:
+        with open(file_path, 'rb') as file:
+            # The export's top level is a list, so 'item' yields each entry
+            for item in ijson.items(file, 'item', use_float=True):
+                yield item
+    except Exception as e:
+        print(f"Error streaming file {file_path}: {e}")
+
+def read_json_file(file_path, max_file_size_mb=100, stream=False, size_checked=False):
+    """Read and parse JSON file with error handling.
 
-def read_json_file(file_path, max_file_size_mb=100):
-    """Read and parse JSON file with error handling."""
+    With stream=True (and ijson installed) the top-level list is not
+    loaded into memory; a generator yielding one entry at a time is
+    returned instead, so the size limit prompt is skipped. Callers that
+    have already run the size check (directory mode prompts in the
+    parent, since pool workers have no usable stdin) pass
+    size_checked=True to suppress the prompt here.
+    """
     try:
+        if stream and ijson is not None:
+            return _iter_json_items(file_path)
+
         # Check file size before attempting to read
         file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-        if file_size_mb > max_file_size_mb:
+        if not size_checked and file_size_mb > max_file_size_mb:
             print(f"Warning: File {file_path} is {file_size_mb:.2f}MB, which exceeds the default limit of {max_file_size_mb}MB.")
             response = input(f"Do you want to continue reading this file? (y/n): ")
             if response.lower() != 'y':
                 print(f"Skipping file {file_path} due to size.")
                 return None
                 
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+        # orjson wants raw bytes (it assumes UTF-8), so read in binary mode
+        with open(file_path, 'rb') as file:
+            if orjson is not None:
+                if file_size_mb > 50:
+                    # Memory-map big files and parse straight from the
+                    # mapping: the kernel demand-pages the file and we
+                    # skip copying it into the Python heap first
+                    mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                    try:
+                        data = orjson.loads(memoryview(mm))
+                    finally:
+                        mm.close()
+                else:
+                    data = orjson.loads(file.read())
+            else:
+                data = json.load(file)
             if DEBUG_MODE:
                 print(f"\nFile structure analysis for {os.path.basename(file_path)}:")
                 if isinstance(data, list):
                     print(f"- Contains a list with {len(data)} entries")
                     if data and len(data) > 0 and DEBUG_ENTRIES > 0:
                         print(f"- First entry keys: {list(data[0].keys()) if isinstance(data[0], dict) else type(data[0])}")
-                        print("- Structure of first entry:")
-                        pprint.pprint(data[0], depth=2, compact=True)
+                        print("- Structure of first entry (first 5 keys):")
+                        # pprint traverses everything it is given even with
+                        # a depth limit, so trim the entry before dumping -
+                        # a conversation's mapping can hold thousands of
+                        # nodes
+                        if isinstance(data[0], dict):
+                            pprint.pprint({k: data[0][k] for k in list(data[0])[:5]}, depth=1)
+                        else:
+                            pprint.pprint(data[0], depth=1)
                 else:
                     print(f"- Contains a dictionary with keys: {list(data.keys())}")
             return data
@@ -96,32 +185,41 @@ def extract_messages_safely(entry):
         print("Unknown entry structure, available keys:", list(entry.keys()))
     return []
 
+# Exact-type dispatch for the simple content shapes; ChatGPT payloads
+# never subclass these, and a single type() lookup beats re-running an
+# isinstance chain per message
+_CONTENT_DISPATCH = {
+    str: lambda c: c,
+    list: lambda c: "\n".join(str(item) for item in c if item),
+}
+
 def _get_message_content(message):
     """Extract content from message with comprehensive format handling."""
     try:
         if not message or not isinstance(message, dict):
             return ""
-            
+
         if "content" not in message:
             # Try alternative fields that might contain content
             for field in ["text", "value", "body"]:
                 if field in message:
                     return str(message[field])
             return ""
-            
+
         content = message["content"]
-        
-        # Handle different content structures
-        if isinstance(content, str):
-            return content
-            
-        elif isinstance(content, dict):
-            # Handle various dictionary formats
-            if "parts" in content:
-                parts = content["parts"]
+
+        # Handle the simple content structures via the dispatch table
+        handler = _CONTENT_DISPATCH.get(type(content))
+        if handler is not None:
+            return handler(content)
+
+        if type(content) is dict:
+            # Fast path first: nearly every message keeps its text in "parts"
+            parts = content.get("parts")
+            if parts is not None:
                 # Extract and join text content from parts
                 return "\n".join(
-                    part["text"] if isinstance(part, dict) and "text" in part else str(part) 
+                    part["text"] if type(part) is dict and "text" in part else str(part)
                     for part in parts if part
                 )
             elif "text" in content:
@@ -140,14 +238,10 @@ def _get_message_content(message):
                 if text_fields:
                     return "\n".join(text_fields)
                 return f"[Message content in unknown format]"
-        
-        # Handle list format
-        elif isinstance(content, list):
-            return "\n".join(str(item) for item in content if item)
-            
+
         # Fall back to string representation
         return str(content)
-            
+
     except Exception as e:
         if DEBUG_MODE:
             print(f"Error extracting message content: {e}")
@@ -191,14 +285,16 @@ def get_create_time_safely(message):
             elif isinstance(value, str):
                 # Try to parse ISO format date string
                 try:
-                    from dateutil import parser
-                    dt = parser.parse(value)
-                    return dt.timestamp()
-                except (ImportError, ValueError):
+                    return _isoparse(value).timestamp()
+                except ValueError:
                     pass
                 
     return None
 
+def _to_ts(value):
+    """Normalize a timestamp-ish value to a positive number, else None."""
+    return value if isinstance(value, (int, float)) and value > 0 else None
+
 def _get_title(title, first_message=None, create_time=None):
     """Generate a title for the conversation with date prefix if available."""
     if not title or title.strip() == "":
@@ -216,18 +312,45 @@ def _get_title(title, first_message=None, create_time=None):
     
     return title
 
-def process_conversations(data, output_dir, config):
-    """Process all conversations with improved handling."""
+def process_conversations(data, output_dir, config, show_progress=True):
+    """Process all conversations with improved handling.
+
+    Directory-mode workers pass show_progress=False: concurrent bars
+    from several processes would fight over the one inherited terminal.
+    """
     processed = 0
     skipped = 0
     skipped_old = 0
     filter_before_year = config.get('filter_before_year', 2025)
-    
-    for entry in tqdm(data, desc="Processing conversations"):
+
+    # Hoist per-entry lookups out of the loop: locals resolve via
+    # LOAD_FAST, while each config[...] or attribute access below would
+    # otherwise cost a dict lookup on every iteration
+    sep = config['message_separator']
+    date_fmt = config['date_format']
+    user_name = config['user_name']
+    asst_name = config['assistant_name']
+    skip_empty = config['skip_empty_messages']
+    enable_summarization = config.get('enable_summarization', False)
+    # Only two author prefixes ever occur, so format them once here
+    # rather than building an f-string per message
+    user_prefix = f"**{user_name}**: "
+    asst_prefix = f"**{asst_name}**: "
+    _fromts = datetime.fromtimestamp
+    _join = os.path.join
+
+    # data may be a streamed generator, in which case its length is
+    # unknown; throttle redraws and skip the bar entirely when stderr is
+    # not a terminal (CI, redirected logs)
+    total = len(data) if hasattr(data, '__len__') else None
+    pbar = tqdm(data, desc="Processing conversations", total=total,
+                mininterval=0.5,
+                disable=not show_progress or not sys.stderr.isatty())
+    for entry in pbar:
         try:
             # Skip non-dict entries
             if not isinstance(entry, dict):
-                print(f"Skipping entry, expected dict but got {type(entry).__name__}")
+                tqdm.write(f"Skipping entry, expected dict but got {type(entry).__name__}")
                 skipped += 1
                 continue
 
@@ -240,153 +363,187 @@ def process_conversations(data, output_dir, config):
             conversation_create_time = entry.get("create_time")
             update_time = entry.get("update_time")
             
+            # Cheap reject for old string timestamps: ISO-8601 starts
+            # with the year, so a four-digit prefix comparison filters
+            # without any date parsing
+            if isinstance(conversation_create_time, str) and len(conversation_create_time) >= 4:
+                year_prefix = conversation_create_time[:4]
+                if year_prefix.isdigit() and int(year_prefix) < filter_before_year:
+                    if DEBUG_DATES:
+                        tqdm.write(f"Skipping conversation from {year_prefix} (before {filter_before_year}): {title}")
+                    skipped_old += 1
+                    continue
+
             # Check conversation creation time format
             if isinstance(conversation_create_time, str):
                 try:
-                    from dateutil import parser
-                    conversation_create_time = parser.parse(conversation_create_time).timestamp()
-                except (ImportError, ValueError):
+                    conversation_create_time = _isoparse(conversation_create_time).timestamp()
+                except ValueError:
                     if DEBUG_DATES:
-                        print(f"Failed to parse conversation create_time string: {conversation_create_time}")
+                        tqdm.write(f"Failed to parse conversation create_time string: {conversation_create_time}")
                     conversation_create_time = None
-            
+
+            # Normalize to a positive number (or None) once so every check
+            # below is a plain truthiness test
+            conversation_create_time = _to_ts(conversation_create_time)
+
             # Filter by conversation date early if possible
-            if conversation_create_time and isinstance(conversation_create_time, (int, float)) and conversation_create_time > 0:
-                conversation_year = datetime.fromtimestamp(conversation_create_time).year
+            if conversation_create_time:
+                conversation_year = _fromts(conversation_create_time).year
                 if conversation_year < filter_before_year:
                     if DEBUG_DATES:
-                        print(f"Skipping conversation from {conversation_year} (before {filter_before_year}): {title}")
+                        tqdm.write(f"Skipping conversation from {conversation_year} (before {filter_before_year}): {title}")
                     skipped_old += 1
                     continue
             
             # Skip if mapping is missing or empty
             if not mapping:
-                print(f"Skipping entry with no mapping data, title: {title}")
+                tqdm.write(f"Skipping entry with no mapping data, title: {title}")
                 skipped += 1
                 continue
 
-            # Extract and sort messages
-            messages = []
-            for item_id, item in mapping.items():
-                if not isinstance(item, dict) or "message" not in item:
-                    continue
-                
-                message = item.get("message")
-                if message is None:
-                    continue
-                
-                # Ensure message has required fields to prevent NoneType errors
-                if not isinstance(message, dict):
-                    continue
-                    
-                if "author" not in message or not isinstance(message.get("author"), dict):
-                    message["author"] = {"role": "unknown"}
-                    
-                messages.append(message)
+            # Extract messages in one pass over the mapping values;
+            # .values() skips the (key, value) tuple allocation of
+            # .items() and the comprehension keeps only dict messages
+            messages = [m for it in mapping.values() if isinstance(it, dict)
+                        for m in (it.get("message"),) if isinstance(m, dict)]
             
             # Skip if no messages found
             if not messages:
-                print(f"Skipping entry with no messages, title: {title}")
+                tqdm.write(f"Skipping entry with no messages, title: {title}")
                 skipped += 1
                 continue
                 
-            # Sort messages by create_time
-            messages.sort(key=lambda x: x.get("create_time", 0) or 0)
-            
-            # Get earliest message create_time for date in filename and filtering
-            message_create_time = None
-            if messages:
-                message_create_time = get_create_time_safely(messages[0])
-            
-            # Use the earliest available timestamp
-            create_time = conversation_create_time
-            if not create_time or create_time <= 0:
-                create_time = message_create_time
+            # Get earliest message create_time for date in filename and
+            # filtering; min() is O(n), so the full sort is deferred until
+            # we know the conversation survives the year filter
+            earliest_message = min(messages, key=lambda m: m.get("create_time") or float('inf'))
+            message_create_time = get_create_time_safely(earliest_message)
             
+            # Use the earliest available timestamp; both candidates are
+            # already normalized to positive-or-None
+            create_time = conversation_create_time or message_create_time
+
+            # Resolve the timestamp to a datetime once; the year filter,
+            # filename prefix and metadata footer all reuse it
+            dt = _fromts(create_time) if create_time else None
+
             # Final filter check - use most reliable timestamp
-            if create_time and isinstance(create_time, (int, float)) and create_time > 0:
-                conversation_year = datetime.fromtimestamp(create_time).year
+            if dt is not None:
                 if DEBUG_DATES:
-                    print(f"Conversation '{title}' date: {datetime.fromtimestamp(create_time).strftime('%Y-%m-%d')}")
-                
-                if conversation_year < filter_before_year:
+                    tqdm.write(f"Conversation '{title}' date: {dt.strftime('%Y-%m-%d')}")
+
+                if dt.year < filter_before_year:
                     if DEBUG_DATES:
-                        print(f"Skipping conversation from {conversation_year} (before {filter_before_year}): {title}")
+                        tqdm.write(f"Skipping conversation from {dt.year} (before {filter_before_year}): {title}")
                     skipped_old += 1
                     continue
             else:
                 if DEBUG_DATES:
-                    print(f"Warning: No valid timestamp found for conversation: {title}")
-            
+                    tqdm.write(f"Warning: No valid timestamp found for conversation: {title}")
+
             # Generate title without date prefix
-            inferred_title = _get_title(title, messages[0] if messages else None)
-            
+            inferred_title = _get_title(title, earliest_message)
+
             # Get date string for title prefix
             date_str = ""
-            if create_time and isinstance(create_time, (int, float)) and create_time > 0:
+            if dt is not None:
                 try:
-                    date_str = datetime.fromtimestamp(create_time).strftime(config['date_format'])
+                    date_str = dt.strftime(date_fmt)
                 except (ValueError, TypeError) as e:
                     if DEBUG_DATES:
-                        print(f"Error formatting date for {create_time}: {e}")
+                        tqdm.write(f"Error formatting date for {create_time}: {e}")
             
             # Create filename with date prefix
-            sanitized_title = ''.join(c for c in inferred_title if c.isalnum() or c in [' ', '_', '-']).rstrip()
+            if inferred_title.isascii():
+                sanitized_title = inferred_title.translate(_SANITIZE_TABLE).rstrip()
+            else:
+                sanitized_title = _SANITIZE_RE.sub('', inferred_title).rstrip()
+            sanitized_title = _SPACE_RE.sub('_', sanitized_title)
             if date_str:
-                file_name = f"{date_str}_{sanitized_title.replace(' ', '_')}.md"
+                file_name = f"{date_str}_{sanitized_title}.md"
             else:
-                file_name = f"{sanitized_title.replace(' ', '_')}.md"
-            file_path = os.path.join(output_dir, file_name)
-            
-            # Generate content
-            content = ""
+                file_name = f"{sanitized_title}.md"
+            file_path = _join(output_dir, file_name)
             
+            # Generate content - collect pieces in a list and join once at
+            # the end, since repeated str += is quadratic in total length
+            parts = []
+
             # Add title with creation time at the beginning
             if date_str:
-                content += f"# {date_str} {inferred_title}{config['message_separator']}"
+                parts.append(f"# {date_str} {inferred_title}{sep}")
             else:
-                content += f"# {inferred_title}{config['message_separator']}"
-            
+                parts.append(f"# {inferred_title}{sep}")
+
             # Add conversation ID as metadata
-            content += f"<sub>Conversation ID: {conversation_id}</sub>{config['message_separator']}"
-            
+            parts.append(f"<sub>Conversation ID: {conversation_id}</sub>{sep}")
+
             # Add creation time metadata
-            if create_time and isinstance(create_time, (int, float)) and create_time > 0:
-                formatted_date = datetime.fromtimestamp(create_time).strftime("%Y-%m-%d %H:%M:%S")
-                content += f"<sub>Creation time: {formatted_date}</sub>{config['message_separator']}"
-            
+            if dt is not None:
+                formatted_date = dt.strftime("%Y-%m-%d %H:%M:%S")
+                parts.append(f"<sub>Creation time: {formatted_date}</sub>{sep}")
+
             # Add placeholder for future summarization feature
-            if config.get('enable_summarization', False):
+            if enable_summarization:
                 # This will be implemented in the future
-                content += f"**Summary:** [Not implemented yet]{config['message_separator']}"
+                parts.append(f"**Summary:** [Not implemented yet]{sep}")
             
+            # Sort messages by create_time, only now that the conversation
+            # is definitely being written; argsorting a float64 array runs
+            # in C rather than Timsort calling a Python key per message
+            if np is not None and len(messages) > 1:
+                try:
+                    ts = np.fromiter((m.get("create_time") or 0.0 for m in messages),
+                                     dtype=np.float64, count=len(messages))
+                    order = np.argsort(ts, kind='stable')
+                    messages = [messages[i] for i in order.tolist()]
+                except (TypeError, ValueError):
+                    # Non-numeric create_time values - sort in Python
+                    messages.sort(key=lambda x: x.get("create_time", 0) or 0)
+            else:
+                messages.sort(key=lambda x: x.get("create_time", 0) or 0)
+
             # Add messages
             for message in messages:
                 try:
-                    author_role = message.get("author", {}).get("role", "unknown")
+                    # No sentinel-dict default here: messages with a
+                    # missing or malformed author just read as "unknown"
+                    author = message.get("author")
+                    author_role = author.get("role", "unknown") if type(author) is dict else "unknown"
                     msg_content = _get_message_content(message)
                     
                     # Skip empty messages if configured
-                    if not config['skip_empty_messages'] or msg_content.strip():
-                        author_name = config['user_name'] if author_role == "user" else config['assistant_name']
-                        content += f"**{author_name}**: {msg_content}{config['message_separator']}"
+                    if not skip_empty or msg_content.strip():
+                        prefix = user_prefix if author_role == "user" else asst_prefix
+                        parts.append(prefix)
+                        parts.append(msg_content)
+                        parts.append(sep)
                 except Exception as e:
-                    print(f"Error processing message: {e}")
+                    tqdm.write(f"Error processing message: {e}")
                     continue
-            
+
+            content = "".join(parts)
+
             # Skip if content is too short (likely empty conversation)
             if len(content.strip()) < 10:
-                print(f"Skipping conversation with insufficient content: {inferred_title}")
+                tqdm.write(f"Skipping conversation with insufficient content: {inferred_title}")
                 skipped += 1
                 continue
                 
-            # Write to file
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            # Write to file - encode once and push the bytes through a raw
+            # fd in a single write, skipping the TextIOWrapper layer and
+            # its separate flush
+            encoded = content.encode('utf-8')
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, encoded)
+            finally:
+                os.close(fd)
             processed += 1
             
         except Exception as e:
-            print(f"Error processing entry: {e}")
+            tqdm.write(f"Error processing entry: {e}")
             skipped += 1
     
     if skipped_old > 0:
@@ -394,6 +551,18 @@ def process_conversations(data, output_dir, config):
         
     return processed, skipped
 
+def _process_file(path, output_dir, config, max_file_size_mb):
+    """Worker for directory mode: convert a single JSON file.
+
+    The parent has already size-checked (and, if needed, prompted for)
+    every path it submits, so the worker never touches stdin.
+    """
+    print(f"Processing {path}...")
+    data = read_json_file(path, max_file_size_mb=max_file_size_mb, size_checked=True)
+    if not data:
+        return 0, 0
+    return process_conversations(data, output_dir, config, show_progress=False)
+
 def main():
     config_path = "config.json"
     try:
@@ -442,19 +611,37 @@ def main():
             
             json_files = glob.glob(os.path.join(input_path, '*.json'))
             print(f"Found {len(json_files)} JSON files in {input_path}")
-            
+
+            # Run the oversized-file prompt here in the parent: pool
+            # workers inherit a closed stdin, so input() there raises
+            # EOFError and every large file would be silently skipped
+            approved_files = []
             for json_file in json_files:
-                print(f"Processing {json_file}...")
-                data = read_json_file(json_file, max_file_size_mb=max_file_size)
-                if data:
-                    processed, skipped = process_conversations(data, output_dir, config)
+                file_size_mb = os.path.getsize(json_file) / (1024 * 1024)
+                if file_size_mb > max_file_size:
+                    print(f"Warning: File {json_file} is {file_size_mb:.2f}MB, which exceeds the default limit of {max_file_size}MB.")
+                    response = input(f"Do you want to continue reading this file? (y/n): ")
+                    if response.lower() != 'y':
+                        print(f"Skipping file {json_file} due to size.")
+                        continue
+                approved_files.append(json_file)
+
+            # Each file is independent and writes distinct outputs, so fan
+            # the work out across cores; the GIL otherwise serializes the
+            # JSON parsing and string building
+            with ProcessPoolExecutor() as executor:
+                futures = [executor.submit(_process_file, json_file, output_dir, config, max_file_size)
+                           for json_file in approved_files]
+                for future in as_completed(futures):
+                    processed, skipped = future.result()
                     processed_total += processed
                     skipped_total += skipped
-                    
+
             print(f"Completed processing all files. Processed: {processed_total}, Skipped: {skipped_total}")
         else:
-            # Single file mode
-            data = read_json_file(input_path, max_file_size_mb=max_file_size)
+            # Single file mode - stream the export so even multi-GB
+            # conversations.json files never sit fully in memory
+            data = read_json_file(input_path, max_file_size_mb=max_file_size, stream=True)
             if data:
                 processed, skipped = process_conversations(data, output_dir, config)
                 print(f"Completed. Processed: {processed}, Skipped: {skipped}")